@@ -2,11 +2,21 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
+from functools import cache
+from urllib.parse import urljoin
 
 import modal
 
-from config import WHISPER_MODELS_MOUNT, WHISPER_MODELS_VOLUME
+from config import (
+    SANDBOX_POOL_REFILL_INTERVAL_SECONDS,
+    SANDBOX_POOL_MAX_SIZE,
+    SESSION_CREATE_MAX_INPUTS,
+    WHISPER_MODELS_MOUNT,
+    WHISPER_MODELS_VOLUME,
+)
 
 app = modal.App("valet-backend")
 
@@ -14,22 +24,39 @@ app = modal.App("valet-backend")
 # Also mount runner package and docker files so sandbox image builds can reference them
 fn_image = (
     modal.Image.debian_slim()
-    .pip_install("fastapi[standard]")
-    .add_local_python_source("session", "sandboxes", "config", "images")
+    .pip_install("fastapi[standard]", "httpx[http2]")
+    .add_local_python_source("session", "sandboxes", "config", "images", "schemas")
     .add_local_dir("docker", remote_path="/root/docker")
     .add_local_dir("packages/runner", remote_path="/root/packages/runner")
     .add_local_dir("packages/shared", remote_path="/root/packages/shared")
 )
 
-from sandboxes import SandboxAlreadyFinishedError, SandboxSnapshotFailedError
-from session import CreateSessionRequest, SessionManager
+from fastapi.responses import JSONResponse
+
+from sandboxes import SandboxAlreadyFinishedError, SandboxCreationError, SandboxSnapshotFailedError
+from schemas import (
+    CreateSessionBody,
+    DeleteWorkspaceResponse,
+    HibernateResponse,
+    RestoreSessionBody,
+    SandboxBody,
+    SessionResponse,
+    SuccessResponse,
+    WorkspaceBody,
+)
+from session import SessionManager
+
 
-session_manager = SessionManager(app)
+@cache
+def get_session_manager() -> SessionManager:
+    """Return the container's SessionManager, built on first use rather than at import."""
+    return SessionManager(app)
 
 
 @app.function(image=fn_image, timeout=1800)
+@modal.concurrent(max_inputs=SESSION_CREATE_MAX_INPUTS)
 @modal.fastapi_endpoint(method="POST", label="create-session")
-async def create_session(request: dict) -> dict:
+async def create_session(body: CreateSessionBody) -> SessionResponse:
     """Create a new session and spawn a sandbox.
 
     Request body:
@@ -47,32 +74,20 @@ async def create_session(request: dict) -> dict:
         sandboxId: str
         tunnelUrls: dict[str, str]
     """
-    req = CreateSessionRequest(
-        session_id=request["sessionId"],
-        user_id=request["userId"],
-        workspace=request["workspace"],
-        image_type=request.get("imageType", "base"),
-        do_ws_url=request["doWsUrl"],
-        runner_token=request["runnerToken"],
-        jwt_secret=request["jwtSecret"],
-        idle_timeout_seconds=request.get("idleTimeoutSeconds", 900),
-        cpu_cores=request.get("sandboxCpuCores"),
-        memory_mib=request.get("sandboxMemoryMib"),
-        env_vars=request.get("envVars"),
-        persona_files=request.get("personaFiles"),
-    )
-
-    result = await session_manager.create(req)
-
-    return {
-        "sandboxId": result.sandbox_id,
-        "tunnelUrls": result.tunnel_urls,
-    }
+    try:
+        result = await get_session_manager().create(body.to_request())
+    except SandboxCreationError as exc:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "sandbox_creation_failed", "message": str(exc)},
+        )
+
+    return SessionResponse(sandbox_id=result.sandbox_id, tunnel_urls=result.tunnel_urls)
 
 
 @app.function(image=fn_image)
 @modal.fastapi_endpoint(method="POST", label="terminate-session")
-async def terminate_session(request: dict) -> dict:
+async def terminate_session(body: SandboxBody) -> SuccessResponse:
     """Terminate a session's sandbox.
 
     Request body:
@@ -81,14 +96,13 @@ async def terminate_session(request: dict) -> dict:
     Returns:
         success: bool
     """
-    sandbox_id = request["sandboxId"]
-    await session_manager.terminate(sandbox_id)
-    return {"success": True}
+    await get_session_manager().terminate(body.sandbox_id)
+    return SuccessResponse()
 
 
 @app.function(image=fn_image)
 @modal.fastapi_endpoint(method="POST", label="hibernate-session")
-async def hibernate_session(request: dict) -> dict:
+async def hibernate_session(body: SandboxBody) -> HibernateResponse:
     """Hibernate a session by snapshotting the sandbox filesystem and terminating it.
 
     Request body:
@@ -97,11 +111,8 @@ async def hibernate_session(request: dict) -> dict:
     Returns:
         snapshotImageId: str
     """
-    from fastapi.responses import JSONResponse
-
-    sandbox_id = request["sandboxId"]
     try:
-        snapshot_image_id = await session_manager.hibernate(sandbox_id)
+        snapshot_image_id = await get_session_manager().hibernate(body.sandbox_id)
     except SandboxAlreadyFinishedError:
         return JSONResponse(
             status_code=409,
@@ -112,12 +123,13 @@ async def hibernate_session(request: dict) -> dict:
             status_code=503,
             content={"error": "snapshot_failed", "message": str(exc)},
         )
-    return {"snapshotImageId": snapshot_image_id}
+    return HibernateResponse(snapshot_image_id=snapshot_image_id)
 
 
 @app.function(image=fn_image, timeout=1800)
+@modal.concurrent(max_inputs=SESSION_CREATE_MAX_INPUTS)
 @modal.fastapi_endpoint(method="POST", label="restore-session")
-async def restore_session(request: dict) -> dict:
+async def restore_session(body: RestoreSessionBody) -> SessionResponse:
     """Restore a session from a filesystem snapshot.
 
     Request body:
@@ -136,32 +148,20 @@ async def restore_session(request: dict) -> dict:
         sandboxId: str
         tunnelUrls: dict[str, str]
     """
-    req = CreateSessionRequest(
-        session_id=request["sessionId"],
-        user_id=request["userId"],
-        workspace=request["workspace"],
-        image_type=request.get("imageType", "base"),
-        do_ws_url=request["doWsUrl"],
-        runner_token=request["runnerToken"],
-        jwt_secret=request["jwtSecret"],
-        idle_timeout_seconds=request.get("idleTimeoutSeconds", 900),
-        cpu_cores=request.get("sandboxCpuCores"),
-        memory_mib=request.get("sandboxMemoryMib"),
-        env_vars=request.get("envVars"),
-        persona_files=request.get("personaFiles"),
-    )
-
-    result = await session_manager.restore(req, request["snapshotImageId"])
-
-    return {
-        "sandboxId": result.sandbox_id,
-        "tunnelUrls": result.tunnel_urls,
-    }
+    try:
+        result = await get_session_manager().restore(body.to_request(), body.snapshot_image_id)
+    except SandboxCreationError as exc:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "sandbox_creation_failed", "message": str(exc)},
+        )
+
+    return SessionResponse(sandbox_id=result.sandbox_id, tunnel_urls=result.tunnel_urls)
 
 
 @app.function(image=fn_image)
 @modal.fastapi_endpoint(method="POST", label="session-status")
-async def session_status(request: dict) -> dict:
+async def session_status(body: SandboxBody) -> dict:
     """Get status of a session's sandbox.
 
     Request body:
@@ -171,13 +171,19 @@ async def session_status(request: dict) -> dict:
         sandboxId: str
         status: str
     """
-    sandbox_id = request["sandboxId"]
-    return await session_manager.status(sandbox_id)
+    try:
+        return await get_session_manager().status(body.sandbox_id)
+    except TimeoutError:
+        # Modal did not answer and this container has no last known status.
+        return JSONResponse(
+            status_code=503,
+            content={"error": "status_lookup_timeout", "message": "Sandbox status lookup timed out. Retry."},
+        )
 
 
 @app.function(image=fn_image)
 @modal.fastapi_endpoint(method="POST", label="delete-workspace")
-async def delete_workspace(request: dict) -> dict:
+async def delete_workspace(body: WorkspaceBody) -> DeleteWorkspaceResponse:
     """Delete a session's persisted workspace volume.
 
     Request body:
@@ -187,9 +193,30 @@ async def delete_workspace(request: dict) -> dict:
         success: bool
         deleted: bool
     """
-    session_id = request["sessionId"]
-    deleted = await session_manager.delete_workspace(session_id)
-    return {"success": True, "deleted": deleted}
+    deleted = await get_session_manager().delete_workspace(body.session_id)
+    return DeleteWorkspaceResponse(deleted=deleted)
+
+
+@app.function(
+    image=fn_image,
+    schedule=modal.Period(seconds=SANDBOX_POOL_REFILL_INTERVAL_SECONDS) if SANDBOX_POOL_MAX_SIZE > 0 else None,
+    max_containers=1,
+    timeout=600,
+)
+async def refill_sandbox_pool() -> None:
+    """Resize the warm sandbox pool. Scheduled only when SANDBOX_POOL_MAX_SIZE > 0."""
+    await get_session_manager().sandbox_manager.pool.refill()
+
+
+@app.function(image=fn_image, timeout=900)
+async def setup_browser_profile() -> None:
+    """Build the pre-initialized Chromium profile used by agent-browser. Run once.
+
+    Re-run after Chromium or agent-browser upgrades.
+
+    Usage: modal run backend/app.py::setup_browser_profile
+    """
+    await get_session_manager().sandbox_manager.seed_browser_profile()
 
 
 @app.function(
@@ -202,21 +229,106 @@ def setup_whisper_models():
 
     Usage: modal run backend/app.py::setup_whisper_models
     """
-    import urllib.request
+    asyncio.run(_download_whisper_models())
+    modal.Volume.from_name("whisper-models").commit()
+
+
+async def _download_whisper_models() -> None:
+    """Download missing or corrupt models concurrently, each as parallel byte ranges.
+
+    Hugging Face publishes each LFS file's size and SHA-256 on the resolve
+    redirect, so existing files are verified against those rather than an
+    approximate size.
+    """
+    import httpx
 
     mount = "/models/whisper"
     base_url = "https://huggingface.co/ggerganov/whisper.cpp/resolve/main"
-    models = [
-        ("ggml-base.en.bin", 142_000_000),
-        ("ggml-large-v3.bin", 3_095_000_000),
-    ]
-    for name, expected_size in models:
+    models = ["ggml-base.en.bin", "ggml-large-v3.bin"]
+
+    async def fetch(name: str) -> None:
         path = f"{mount}/{name}"
-        if os.path.exists(path) and os.path.getsize(path) > expected_size * 0.9:
-            print(f"Already exists: {name} ({os.path.getsize(path)} bytes)")
-            continue
+        url, size, sha256 = await _resolve_download(meta_client, f"{base_url}/{name}")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_size == size:
+            if sha256 is None or await asyncio.to_thread(_sha256_file, path) == sha256:
+                print(f"Already exists: {name} ({st.st_size} bytes)")
+                return
+            print(f"Checksum mismatch, re-downloading: {name}")
         print(f"Downloading {name}...")
-        urllib.request.urlretrieve(f"{base_url}/{name}", path)
-        print(f"Downloaded {name} ({os.path.getsize(path)} bytes)")
-
-    modal.Volume.from_name("whisper-models").commit()
+        await _download_ranged(data_client, url, path, size)
+        if sha256 is not None and await asyncio.to_thread(_sha256_file, path) != sha256:
+            raise RuntimeError(f"Checksum mismatch for {name} after download")
+        print(f"Downloaded {name} ({size} bytes)")
+
+    # HTTP/2 multiplexes the metadata HEADs over one connection. Range
+    # requests use HTTP/1.1 so each gets its own TCP connection; over one
+    # HTTP/2 connection they would share a single congestion window.
+    async with (
+        httpx.AsyncClient(http2=True, timeout=httpx.Timeout(60.0)) as meta_client,
+        httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=16),
+            timeout=httpx.Timeout(60.0),
+        ) as data_client,
+    ):
+        await asyncio.gather(*(fetch(name) for name in models))
+
+
+async def _resolve_download(client, url: str) -> tuple[str, int, str | None]:
+    """Resolve a Hugging Face file URL to (download_url, size, sha256)."""
+    resp = await client.head(url)
+    if resp.is_redirect and "X-Linked-Size" in resp.headers:
+        # LFS files redirect to the CDN; the redirect carries the file's
+        # size and SHA-256. Range requests then go straight to the CDN.
+        etag = resp.headers.get("X-Linked-ETag", "").strip('"')
+        return (
+            urljoin(str(resp.url), resp.headers["Location"]),
+            int(resp.headers["X-Linked-Size"]),
+            etag if len(etag) == 64 else None,
+        )
+    resp = await client.head(url, follow_redirects=True)
+    resp.raise_for_status()
+    return str(resp.url), int(resp.headers["Content-Length"]), None
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+async def _download_ranged(client, url: str, path: str, size: int, parts: int = 8) -> None:
+    """Download url into path as `parts` concurrent Range requests."""
+    loop = asyncio.get_running_loop()
+    part_size = -(-size // parts)
+
+    async def fetch_range(fd: int, start: int, end: int) -> None:
+        async with client.stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as resp:
+            resp.raise_for_status()
+            if resp.status_code != 206:
+                raise RuntimeError(f"Server ignored Range request for {url} (status {resp.status_code})")
+            offset = start
+            async for chunk in resp.aiter_bytes(1 << 20):
+                await loop.run_in_executor(None, os.pwrite, fd, chunk, offset)
+                offset += len(chunk)
+        if offset != end + 1:
+            raise RuntimeError(f"Short read for {url} bytes {start}-{end}: got {offset - start}")
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        await asyncio.gather(*(
+            fetch_range(fd, start, min(start + part_size, size) - 1)
+            for start in range(0, size, part_size)
+        ))
+    finally:
+        os.close(fd)
+
+    actual = os.stat(path).st_size
+    if actual != size:
+        raise RuntimeError(f"Size mismatch for {path}: expected {size}, got {actual}")
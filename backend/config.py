@@ -10,15 +10,66 @@ MODAL_IDLE_TIMEOUT_BUFFER_SECONDS = 30 * 60  # 30-minute safety buffer beyond DO
 MAX_TIMEOUT_SECONDS = 24 * 60 * 60  # 24 hours
 OPENCODE_PORT = 4096
 GATEWAY_PORT = 9000
+SANDBOX_STATUS_CACHE_TTL_SECONDS = 0.5  # "running" is re-verified after this; "terminated" is final
+SANDBOX_STATUS_CACHE_MAX_ENTRIES = 10_000
+SANDBOX_STATUS_LOOKUP_TIMEOUT_SECONDS = 2.0
+WORKSPACE_DELETE_CONCURRENCY = 8  # concurrent Volume.delete calls in bulk cleanup
+# Sandbox.create calls per second per container; bursts above Modal's
+# creation rate limit fail with "Sandbox creation rate limit exceeded".
+MODAL_CREATION_RATE_LIMIT = 4
+# In-flight session creates/restores per container: the creation rate times
+# the queueing delay (seconds) a request may tolerate before Sandbox.create.
+MAX_CONCURRENT_CREATES = MODAL_CREATION_RATE_LIMIT * 2
+# Requests one create-session or restore-session container accepts at once
+# (modal.concurrent), so a burst shares that container's SessionManager
+# semaphore and creation token bucket; the excess over MAX_CONCURRENT_CREATES
+# waits on the semaphore. These bounds are per container, not app-wide.
+SESSION_CREATE_MAX_INPUTS = 64
+# Client-side bound on one Sandbox.create call. Generous because the first
+# create after an image change also builds the image.
+SANDBOX_CREATE_TIMEOUT_SECONDS = 600
+SANDBOX_CREATE_ATTEMPTS = 2  # one retry on rate limiting
+SANDBOX_CREATE_BACKOFF_SECONDS = 1.0  # doubled per rate-limited attempt
+
+# Warm sandbox pool — pre-spawned sandboxes parked in start.sh until a
+# session is assigned. Set SANDBOX_POOL_SIZE > 0 to enable.
+SANDBOX_POOL_SIZE = 0  # warm sandboxes kept per pooled image type (minimum)
+# Raise above SANDBOX_POOL_SIZE to size the pool from demand: each refill
+# targets the rate of poolable requests, hits and misses alike (EWMA), times
+# the time to replace a claimed sandbox, clamped to
+# [SANDBOX_POOL_SIZE, SANDBOX_POOL_MAX_SIZE].
+SANDBOX_POOL_MAX_SIZE = SANDBOX_POOL_SIZE
+SANDBOX_POOL_RATE_EWMA_ALPHA = 0.3
+SANDBOX_POOL_SPAWN_LATENCY_SECONDS = 10
+SANDBOX_POOL_IMAGE_TYPES = ("base",)
+SANDBOX_POOL_QUEUE = "valet-sandbox-pool"
+SANDBOX_POOL_DEMAND_QUEUE = "valet-sandbox-pool-demand"  # one marker per poolable request
+SANDBOX_POOL_STATS = "valet-sandbox-pool-stats"  # modal.Dict of per-image-type request rate
+SANDBOX_POOL_REFILL_INTERVAL_SECONDS = 30
+SANDBOX_POOL_BATCH_SIZE = 4  # pooled sandboxes spawned per refill batch
+SANDBOX_POOL_BATCH_DELAY_SECONDS = 1.0
+# Services start.sh brings up before parking (x11vnc, noVNC); a pooled
+# sandbox is only enqueued once all of them accept connections.
+SANDBOX_POOL_READY_PORTS = (5900, 6080)
+SANDBOX_POOL_READY_TIMEOUT_SECONDS = 30
+SANDBOX_SESSION_ENV_PATH = "/run/valet/session.env"  # must match docker/start.sh
 
 # Whisper (speech-to-text)
 WHISPER_MODELS_VOLUME = "whisper-models"
 WHISPER_MODELS_MOUNT = "/models/whisper"
 
+# Chromium profile seed for agent-browser, copied into AGENT_BROWSER_PROFILE
+# by start.sh so the first browser launch skips profile initialization.
+BROWSER_PROFILE_VOLUME = "chromium-profile"
+BROWSER_PROFILE_SEED_MOUNT = "/seed/chromium-profile"  # must match docker/start.sh
+
 # Image defaults
 BASE_IMAGE_TAG = "debian:bookworm-slim"
 NODE_VERSION = "22"
 BUN_VERSION = "latest"
+# Pre-built stable layers published by .github/workflows/sandbox-base.yml,
+# e.g. "ghcr.io/<owner>/valet-sandbox-base:2026-04-15". None builds them in Modal.
+SANDBOX_BASE_REGISTRY_IMAGE: str | None = None
 
 
 def get_secret(name: str, default: str = "") -> str:
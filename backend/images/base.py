@@ -10,74 +10,92 @@ as a normal apt package.
 
 Layer ordering strategy: stable, heavy layers first; frequently-changing
 layers (runner, start.sh, opencode config) last. This maximizes Modal
-layer cache hits across deploys.
+layer cache hits across deploys. The stable layers can also be pulled
+pre-built from GHCR (see docker/Dockerfile.sandbox-base).
 """
 
+from functools import lru_cache
+
 import modal
 
-from config import NODE_VERSION
+from config import NODE_VERSION, SANDBOX_BASE_REGISTRY_IMAGE
 
 OPENCODE_VERSION = "1.1.52"
 
+APT_PACKAGES = (
+    # Base tools
+    "git",
+    "curl",
+    "wget",
+    "jq",
+    "ripgrep",
+    "build-essential",
+    "ca-certificates",
+    "gnupg",
+    "sudo",
+    "unzip",
+    "openssh-client",
+    "bash",
+    "procps",
+    # VNC stack + browser
+    "xvfb",
+    "fluxbox",
+    "x11vnc",
+    "websockify",
+    "novnc",
+    "chromium",
+    "imagemagick",
+    "xdotool",
+    "ffmpeg",
+    # BLAS runtime for whisper.cpp (build-only deps live in the whisper layer)
+    "libopenblas0",
+)
 
-def get_base_image() -> modal.Image:
-    """Build the full sandbox image with all dev environment services."""
+# Needed only to compile whisper.cpp; installed and purged within its layer.
+WHISPER_BUILD_PACKAGES = ("cmake", "libopenblas-dev")
+
+# Appended to layers that touch apt or download archives, so package lists
+# and temp files are dropped in the layer that created them.
+APT_CLEANUP = "apt-get clean && rm -rf /var/lib/apt/lists/* /tmp/*"
+
+
+def _stable_layers() -> modal.Image:
+    """Stable, heavy layers. Mirrored by docker/Dockerfile.sandbox-base."""
     return (
         modal.Image.from_registry("debian:bookworm-slim", add_python="3.12")
         # ─── Single apt layer: all system packages ──────────────────────
         # Merging apt_install calls avoids redundant apt-get update runs.
-        .apt_install(
-            # Base tools
-            "git",
-            "curl",
-            "wget",
-            "jq",
-            "ripgrep",
-            "build-essential",
-            "ca-certificates",
-            "gnupg",
-            "sudo",
-            "unzip",
-            "openssh-client",
-            "bash",
-            "procps",
-            # VNC stack + browser
-            "xvfb",
-            "fluxbox",
-            "x11vnc",
-            "websockify",
-            "novnc",
-            "chromium",
-            "imagemagick",
-            "xdotool",
-            "ffmpeg",
-            # Build tools (for whisper.cpp)
-            "cmake",
-        )
+        .apt_install(*APT_PACKAGES)
         # ─── Stable runtimes (rarely change) ────────────────────────────
-        # Install Node.js
+        # Node.js + Bun in one layer; apt lists from the nodesource setup
+        # are cleaned in the same layer so they never reach the image.
         .run_commands(
-            f"curl -fsSL https://deb.nodesource.com/setup_{NODE_VERSION}.x | bash -",
-            "apt-get install -y nodejs",
-            "npm install -g npm@latest",
-        )
-        # Install Bun
-        .run_commands(
-            "curl -fsSL https://bun.sh/install | bash",
+            f"curl -fsSL https://deb.nodesource.com/setup_{NODE_VERSION}.x | bash -"
+            " && apt-get install -y nodejs"
+            " && curl -fsSL https://bun.sh/install | bash"
+            f" && {APT_CLEANUP}",
         )
         # ─── Stable binaries (never change unless version bumped) ───────
-        # whisper.cpp (speech-to-text) — build from source. Placed early
-        # because it's ~120s and never changes.
+        # whisper.cpp (speech-to-text) — build from source. Kept in its own
+        # layer and placed early because it's ~120s and never changes. Build
+        # deps are purged in the same layer so only the binaries ship.
         .run_commands(
+            f"apt-get update && apt-get install -y --no-install-recommends {' '.join(WHISPER_BUILD_PACKAGES)}",
             "git clone --depth 1 https://github.com/ggml-org/whisper.cpp /tmp/whisper-build",
-            "cd /tmp/whisper-build && cmake -B build && cmake --build build --config Release -j$(nproc)",
+            # OpenBLAS gives the encoder a tuned SGEMM instead of ggml's generic kernels.
+            "cd /tmp/whisper-build && cmake -B build -DCMAKE_BUILD_TYPE=Release"
+            " -DGGML_BLAS=ON -DGGML_BLAS_VENDOR=OpenBLAS"
+            " && cmake --build build --config Release -j$(nproc)",
             "cp /tmp/whisper-build/build/bin/whisper-cli /usr/local/bin/whisper-cli",
             "cp /tmp/whisper-build/build/src/libwhisper.so* /usr/local/lib/",
-            "cp /tmp/whisper-build/build/ggml/src/libggml*.so* /usr/local/lib/",
+            # ggml backends (incl. ggml-blas) build into per-backend subdirectories
+            "find /tmp/whisper-build/build/ggml/src -name 'libggml*.so*' -exec cp -P {} /usr/local/lib/ \\;",
             "ldconfig",
             "rm -rf /tmp/whisper-build",
+            f"apt-get purge -y --auto-remove {' '.join(WHISPER_BUILD_PACKAGES)} && {APT_CLEANUP}",
         )
-        # TTYD, cloudflared, code-server — single layer for small binaries
+        # TTYD, cloudflared, code-server + workspace/shell setup — one layer
+        # for small binaries and static config
         .run_commands(
             # TTYD (web terminal)
             'curl -fsSL -o /usr/local/bin/ttyd "https://github.com/tsl0922/ttyd/releases/download/1.7.7/ttyd.x86_64"',
@@ -87,25 +105,6 @@ def get_base_image() -> modal.Image:
             "chmod +x /usr/local/bin/cloudflared",
             # code-server (VS Code in browser)
             "curl -fsSL https://code-server.dev/install.sh | sh",
-        )
-        # ─── OpenCode + Playwright (changes when OPENCODE_VERSION bumps) ─
-        .run_commands(
-            f"npm install -g opencode-ai@{OPENCODE_VERSION} agent-browser",
-        )
-        # Preinstall Playwright Chromium that matches agent-browser's bundled
-        # Playwright version so browser tools work without runtime installs.
-        .run_commands(
-            "mkdir -p /ms-playwright",
-            "AGENT_BROWSER_ROOT=\"$(npm root -g)/agent-browser\"; "
-            "if [ -f \"$AGENT_BROWSER_ROOT/node_modules/playwright/cli.js\" ]; then "
-            "  PLAYWRIGHT_BROWSERS_PATH=/ms-playwright node \"$AGENT_BROWSER_ROOT/node_modules/playwright/cli.js\" install chromium; "
-            "else "
-            "  PLAYWRIGHT_BROWSERS_PATH=/ms-playwright npx --yes playwright install chromium; "
-            "fi",
-            "chmod -R a+rX /ms-playwright",
-        )
-        # ─── Workspace + shell setup (stable) ──────────────────────────
-        .run_commands(
             # Create workspace directory
             "mkdir -p /workspace",
             # Setup bash prompt and environment for terminals
@@ -115,11 +114,60 @@ def get_base_image() -> modal.Image:
             "echo 'export BUN_INSTALL=\"/root/.bun\"' >> /root/.bashrc",
             "echo 'export PATH=\"$BUN_INSTALL/bin:$PATH\"' >> /root/.bashrc",
             "cp /root/.bashrc /etc/bash.bashrc",
+            APT_CLEANUP,
         )
+        # ─── OpenCode + Playwright (changes when OPENCODE_VERSION bumps) ─
+        # Bun-managed globals: packages land in /root/.bun/install/global and
+        # binaries in /root/.bun/bin. --trust lets their postinstall scripts
+        # (platform binary setup) run. Preinstall Playwright Chromium that
+        # matches agent-browser's Playwright so browser tools work without
+        # runtime installs; Bun may hoist playwright out of agent-browser.
+        .run_commands(
+            f"/root/.bun/bin/bun install -g --trust opencode-ai@{OPENCODE_VERSION} agent-browser",
+            "mkdir -p /ms-playwright",
+            "BUN_GLOBAL=/root/.bun/install/global/node_modules; "
+            "PLAYWRIGHT_CLI=\"$BUN_GLOBAL/agent-browser/node_modules/playwright/cli.js\"; "
+            "[ -f \"$PLAYWRIGHT_CLI\" ] || PLAYWRIGHT_CLI=\"$BUN_GLOBAL/playwright/cli.js\"; "
+            "if [ -f \"$PLAYWRIGHT_CLI\" ]; then "
+            "  PLAYWRIGHT_BROWSERS_PATH=/ms-playwright node \"$PLAYWRIGHT_CLI\" install chromium; "
+            "else "
+            "  PLAYWRIGHT_BROWSERS_PATH=/ms-playwright npx --yes playwright install chromium; "
+            "fi",
+            "chmod -R a+rX /ms-playwright",
+            f"rm -rf /root/.bun/install/cache && {APT_CLEANUP}",
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def get_base_image() -> modal.Image:
+    """Build the full sandbox image with all dev environment services.
+
+    With SANDBOX_BASE_REGISTRY_IMAGE set, the stable layers are pulled
+    pre-built from the registry instead of being built by Modal.
+
+    Cached so the builder graph is constructed once per process rather than
+    on every sandbox create.
+    """
+    if SANDBOX_BASE_REGISTRY_IMAGE:
+        image = modal.Image.from_registry(SANDBOX_BASE_REGISTRY_IMAGE, add_python="3.12")
+    else:
+        image = _stable_layers()
+    return (
+        image
         # ─── Frequently-changing layers (last for cache efficiency) ─────
         # Runner + shared packages in a minimal workspace so workspace:* deps resolve.
         # Shared is type-only at runtime (Bun strips type imports) but bun install
         # needs it present to resolve the dependency.
+        # Manifests first so the bun install layer is only rebuilt when
+        # dependencies change, not on every source edit.
+        .add_local_file("/root/packages/shared/package.json", "/valet/packages/shared/package.json", copy=True)
+        .add_local_file("/root/packages/runner/package.json", "/valet/packages/runner/package.json", copy=True)
+        .run_commands(
+            # Create workspace root and install all deps
+            'echo \'{"private":true,"workspaces":["packages/*"]}\' > /valet/package.json',
+            "cd /valet && /root/.bun/bin/bun install",
+        )
         .add_local_dir(
             "/root/packages/shared",
             "/valet/packages/shared",
@@ -133,18 +181,16 @@ def get_base_image() -> modal.Image:
             ignore=["node_modules", "*.log"],
         )
         .run_commands(
-            # Create workspace root and install all deps
-            'echo \'{"private":true,"workspaces":["packages/*"]}\' > /valet/package.json',
-            "cd /valet && /root/.bun/bin/bun install",
             # Symlink runner at /runner for start.sh and workflow CLI
             "ln -s /valet/packages/runner /runner",
             # Expose workflow CLI as a first-class sandbox command
             "printf '#!/bin/bash\\nexec /root/.bun/bin/bun run /runner/src/workflow-cli.ts \"$@\"\\n' > /usr/local/bin/workflow",
             "chmod +x /usr/local/bin/workflow",
         )
-        # Copy start.sh
+        # Copy start.sh and the readiness probe
         .add_local_file("/root/docker/start.sh", "/start.sh", copy=True)
-        .run_commands("chmod +x /start.sh")
+        .add_local_file("/root/docker/wait-ready.sh", "/usr/local/bin/wait-ready.sh", copy=True)
+        .run_commands("chmod +x /start.sh /usr/local/bin/wait-ready.sh")
         # OpenCode config and custom tools (browser access)
         .add_local_dir(
             "/root/docker/opencode",
@@ -2,9 +2,18 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 
+import asyncio
 import logging
+import math
+import os
+import re
+import shlex
+import time
+import uuid
+
 import modal
 
 # ConflictError is public API (Modal v1.3+) but may not exist in older
@@ -18,22 +27,57 @@ except AttributeError:
     except ImportError:
         _ConflictError = None
 
+# Creation rate limiting surfaces as ResourceExhaustedError (gRPC
+# RESOURCE_EXHAUSTED), which older runtime SDKs may also lack; it is then
+# recognized by its message (see _is_rate_limit_error).
+_RateLimitError = getattr(modal.exception, "ResourceExhaustedError", None)
+
 logger = logging.getLogger(__name__)
 
 from config import (
+    BROWSER_PROFILE_SEED_MOUNT,
+    BROWSER_PROFILE_VOLUME,
     DEFAULT_IDLE_TIMEOUT_SECONDS,
     GATEWAY_PORT,
     MAX_TIMEOUT_SECONDS,
+    MODAL_CREATION_RATE_LIMIT,
     MODAL_IDLE_TIMEOUT_BUFFER_SECONDS,
+    SANDBOX_CREATE_ATTEMPTS,
+    SANDBOX_CREATE_BACKOFF_SECONDS,
+    SANDBOX_CREATE_TIMEOUT_SECONDS,
     OPENCODE_PORT,
     SANDBOX_DEFAULT_CPU_CORES,
     SANDBOX_DEFAULT_MEMORY_MIB,
+    SANDBOX_POOL_BATCH_DELAY_SECONDS,
+    SANDBOX_POOL_BATCH_SIZE,
+    SANDBOX_POOL_DEMAND_QUEUE,
+    SANDBOX_POOL_IMAGE_TYPES,
+    SANDBOX_POOL_MAX_SIZE,
+    SANDBOX_POOL_QUEUE,
+    SANDBOX_POOL_RATE_EWMA_ALPHA,
+    SANDBOX_POOL_READY_PORTS,
+    SANDBOX_POOL_READY_TIMEOUT_SECONDS,
+    SANDBOX_POOL_REFILL_INTERVAL_SECONDS,
+    SANDBOX_POOL_SIZE,
+    SANDBOX_POOL_SPAWN_LATENCY_SECONDS,
+    SANDBOX_POOL_STATS,
+    SANDBOX_SESSION_ENV_PATH,
+    SANDBOX_STATUS_CACHE_MAX_ENTRIES,
+    SANDBOX_STATUS_CACHE_TTL_SECONDS,
+    SANDBOX_STATUS_LOOKUP_TIMEOUT_SECONDS,
     WHISPER_MODELS_MOUNT,
     WHISPER_MODELS_VOLUME,
+    WORKSPACE_DELETE_CONCURRENCY,
     get_secret,
 )
 from images.base import get_base_image
 
+# Env var names start.sh can source from the pooled session env file.
+_SHELL_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Client-facing services proxied by the auth gateway, as (tunnel_urls key, path).
+_GATEWAY_SUFFIXES = (("vscode", "/vscode"), ("vnc", "/vnc"), ("ttyd", "/ttyd"))
+
 
 class SandboxAlreadyFinishedError(Exception):
     """Raised when trying to snapshot a sandbox that has already exited."""
@@ -51,7 +95,48 @@ class SandboxSnapshotFailedError(Exception):
         super().__init__(message)
 
 
-@dataclass
+class SandboxCreationError(Exception):
+    """Raised when Modal fails to create a sandbox, after any retries."""
+
+
+class AsyncTokenBucket:
+    """Token bucket for asyncio: `rate` acquisitions per second, bursting to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass(slots=True)
+class RateEstimator:
+    """Exponentially weighted moving average of an event rate, in events/second."""
+
+    alpha: float
+    rate: float = 0.0
+
+    def update(self, events: int, elapsed_seconds: float) -> float:
+        """Fold in `events` observed over `elapsed_seconds` and return the new rate."""
+        if elapsed_seconds > 0:
+            self.rate = self.alpha * (events / elapsed_seconds) + (1 - self.alpha) * self.rate
+        return self.rate
+
+
+@dataclass(slots=True, frozen=True)
 class SandboxConfig:
     session_id: str
     user_id: str
@@ -67,19 +152,41 @@ class SandboxConfig:
     persona_files: list[dict] | None = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SandboxResult:
     sandbox_id: str
     tunnel_urls: dict[str, str]
 
 
+@dataclass(slots=True, frozen=True)
+class PooledSandbox:
+    sandbox_id: str
+    volume_name: str
+    # Object ID of the image the sandbox booted from. Entries queued before
+    # this field existed load with "" and never match the current image.
+    image_id: str = ""
+
+
 class SandboxManager:
     """Manages Modal sandbox creation, termination, and health checks."""
 
     def __init__(self, app: modal.App) -> None:
         self.app = app
+        self.pool = WarmPool(self)
+        self._create_limiter = AsyncTokenBucket(MODAL_CREATION_RATE_LIMIT)
+        # Shared handles are hydrated on first use and reused afterwards, so
+        # later creates skip the name lookup.
+        self._whisper_volume = modal.Volume.from_name(WHISPER_MODELS_VOLUME)
+        self._browser_profile_volume = modal.Volume.from_name(BROWSER_PROFILE_VOLUME, create_if_missing=True)
+        # Sandboxes copy the seed profile out of a read-only mount; only
+        # seed_browser_profile writes to the volume.
+        self._browser_profile_seed = self._browser_profile_volume.read_only()
+        self._base_image = get_base_image()
+        # sandbox_id -> (status, monotonic expiry); see get_sandbox_status.
+        self._status_cache: dict[str, tuple[str, float]] = {}
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def workspace_volume_name(session_id: str) -> str:
         """Return the Modal volume name used for a session workspace.
 
@@ -92,60 +199,25 @@ class SandboxManager:
             session_id = f"{parts[0]}:{parts[1]}"
         return f"workspace-{session_id.replace(':', '-')}"
 
-    async def create_sandbox(self, config: SandboxConfig) -> SandboxResult:
-        """Create a new Modal sandbox for a session."""
-        image = self._get_image(config.image_type)
-
-        # Start with caller-provided env vars (LLM keys, repo config, etc.)
-        secrets_dict: dict[str, str] = dict(config.env_vars) if config.env_vars else {}
-
-        # Core secrets are set last so env_vars cannot override them
-        secrets_dict.update({
-            "DO_WS_URL": config.do_ws_url,
-            "RUNNER_TOKEN": config.runner_token,
-            "SESSION_ID": config.session_id,
-            "JWT_SECRET": config.jwt_secret,
-            "OPENCODE_SERVER_PASSWORD": get_secret("OPENCODE_SERVER_PASSWORD"),
-        })
-
-        # Strip empty values so Modal doesn't set blank env vars
-        secrets_dict = {k: v for k, v in secrets_dict.items() if v}
+    @staticmethod
+    def pool_volume_name() -> str:
+        """Return a fresh workspace volume name for a pooled sandbox.
 
-        sandbox = await modal.Sandbox.create.aio(
-            "/bin/bash", "/start.sh",
-            app=self.app,
-            image=image,
-            cpu=config.cpu_cores,
-            memory=config.memory_mib,
-            encrypted_ports=[OPENCODE_PORT, GATEWAY_PORT],
-            timeout=MAX_TIMEOUT_SECONDS,
-            idle_timeout=config.idle_timeout_seconds + MODAL_IDLE_TIMEOUT_BUFFER_SECONDS,
-            secrets=[modal.Secret.from_dict(secrets_dict)],
-            volumes={
-                "/workspace": modal.Volume.from_name(
-                    self.workspace_volume_name(config.session_id),
-                    create_if_missing=True,
-                ),
-                WHISPER_MODELS_MOUNT: modal.Volume.from_name(WHISPER_MODELS_VOLUME),
-            },
-        )
+        Renamed to workspace_volume_name(session_id) when the sandbox is claimed.
+        """
+        return f"workspace-pool-{uuid.uuid4().hex}"
 
-        tunnels = await sandbox.tunnels.aio()
+    async def create_sandbox(self, config: SandboxConfig) -> SandboxResult:
+        """Create a new Modal sandbox for a session.
 
-        tunnel_urls: dict[str, str] = {}
-        if OPENCODE_PORT in tunnels:
-            tunnel_urls["opencode"] = tunnels[OPENCODE_PORT].url
-        if GATEWAY_PORT in tunnels:
-            gateway_url = tunnels[GATEWAY_PORT].url
-            tunnel_urls["gateway"] = gateway_url
-            tunnel_urls["vscode"] = f"{gateway_url}/vscode"
-            tunnel_urls["vnc"] = f"{gateway_url}/vnc"
-            tunnel_urls["ttyd"] = f"{gateway_url}/ttyd"
+        Claims a warm sandbox from the pool when one fits the config, and
+        otherwise cold-starts a new one.
+        """
+        result = await self.pool.acquire(config)
+        if result is not None:
+            return result
 
-        return SandboxResult(
-            sandbox_id=sandbox.object_id,
-            tunnel_urls=tunnel_urls,
-        )
+        return await self._spawn(self._get_image(config.image_type), config)
 
     async def terminate_sandbox(self, sandbox_id: str) -> None:
         """Terminate a running sandbox."""
@@ -161,19 +233,56 @@ class SandboxManager:
         except modal.exception.NotFoundError:
             return False
 
+    async def delete_workspace_volumes(self, session_ids: list[str]) -> dict[str, bool]:
+        """Delete many sessions' workspace volumes. Returns session_id -> deleted.
+
+        Lists volumes once and only issues deletes for names that exist, at
+        most WORKSPACE_DELETE_CONCURRENCY at a time.
+        """
+        existing = {volume.name for volume in await modal.Volume.objects.list.aio()}
+        sem = asyncio.Semaphore(WORKSPACE_DELETE_CONCURRENCY)
+
+        async def delete_one(session_id: str) -> bool:
+            if self.workspace_volume_name(session_id) not in existing:
+                return False
+            async with sem:
+                return await self.delete_workspace_volume(session_id)
+
+        deleted = await asyncio.gather(*(delete_one(session_id) for session_id in session_ids))
+        return dict(zip(session_ids, deleted))
+
     async def get_sandbox_status(self, sandbox_id: str) -> dict:
-        """Check sandbox status."""
+        """Check sandbox status.
+
+        Each status endpoint call runs in its own container, so the cache only
+        holds this container's previous lookups: "terminated" is final and
+        kept, while "running" is re-verified after
+        SANDBOX_STATUS_CACHE_TTL_SECONDS. A lookup that times out falls back
+        to the last known status, or raises TimeoutError if there is none;
+        only a sandbox Modal does not know is reported terminated, and other
+        errors propagate.
+        """
+        cached = self._status_cache.get(sandbox_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return {"sandbox_id": sandbox_id, "status": cached[0]}
+
         try:
-            sandbox = await modal.Sandbox.from_id.aio(sandbox_id)
-            return {
-                "sandbox_id": sandbox_id,
-                "status": "running",
-            }
-        except Exception:
-            return {
-                "sandbox_id": sandbox_id,
-                "status": "terminated",
-            }
+            await asyncio.wait_for(
+                modal.Sandbox.from_id.aio(sandbox_id),
+                timeout=SANDBOX_STATUS_LOOKUP_TIMEOUT_SECONDS,
+            )
+            status = "running"
+        except TimeoutError:
+            if cached is None:
+                raise
+            status = cached[0]
+        except modal.exception.NotFoundError:
+            status = "terminated"
+        self._record_status(sandbox_id, status)
+        return {
+            "sandbox_id": sandbox_id,
+            "status": status,
+        }
 
     async def snapshot_and_terminate(self, sandbox_id: str) -> str:
         """Snapshot a sandbox's filesystem and terminate it. Returns the snapshot image ID."""
@@ -202,21 +311,240 @@ class SandboxManager:
 
     async def restore_sandbox(self, config: SandboxConfig, snapshot_image_id: str) -> SandboxResult:
         """Restore a sandbox from a filesystem snapshot image."""
-        image = modal.Image.from_id(snapshot_image_id)
+        return await self._spawn(modal.Image.from_id(snapshot_image_id), config)
 
-        secrets_dict: dict[str, str] = dict(config.env_vars) if config.env_vars else {}
+    async def seed_browser_profile(self) -> None:
+        """Populate the Chromium profile seed volume from a one-off sandbox.
 
-        secrets_dict.update({
-            "DO_WS_URL": config.do_ws_url,
-            "RUNNER_TOKEN": config.runner_token,
-            "SESSION_ID": config.session_id,
-            "JWT_SECRET": config.jwt_secret,
+        Launches headless Chromium once against an empty profile directory on
+        the seed volume so sessions can copy an initialized profile.
+        """
+        sandbox = await self._create(
+            app=self.app,
+            image=self._get_image("base"),
+            timeout=10 * 60,
+            volumes={
+                BROWSER_PROFILE_SEED_MOUNT: self._browser_profile_volume,
+            },
+        )
+        try:
+            process = await sandbox.exec.aio(
+                "/bin/bash", "-c",
+                f"rm -rf {BROWSER_PROFILE_SEED_MOUNT}/* "
+                f"&& chromium --headless=new --no-sandbox --disable-gpu --no-first-run "
+                f"--user-data-dir={BROWSER_PROFILE_SEED_MOUNT} --dump-dom about:blank > /dev/null "
+                f"&& rm -f {BROWSER_PROFILE_SEED_MOUNT}/Singleton* "
+                f"&& sync {BROWSER_PROFILE_SEED_MOUNT}",
+                timeout=5 * 60,
+            )
+            exit_code = await process.wait.aio()
+            if exit_code != 0:
+                stderr = await process.stderr.read.aio()
+                raise RuntimeError(f"Chromium profile seeding failed (exit {exit_code}): {stderr}")
+        finally:
+            await sandbox.terminate.aio()
+
+    # ─── Warm pool ───────────────────────────────────────────────────────
+
+    @staticmethod
+    def is_poolable(config: SandboxConfig) -> bool:
+        """Return True when a pooled sandbox can serve this config.
+
+        Pooled sandboxes are spawned with default resources and idle timeout,
+        which cannot be changed after creation. Their session env is sourced
+        by start.sh as shell exports, so every env var name must be a valid
+        shell identifier; Modal secrets on the cold path have no such limit.
+        """
+        return (
+            config.cpu_cores == SANDBOX_DEFAULT_CPU_CORES
+            and config.memory_mib == SANDBOX_DEFAULT_MEMORY_MIB
+            and config.idle_timeout_seconds <= DEFAULT_IDLE_TIMEOUT_SECONDS
+            and all(_SHELL_NAME_RE.fullmatch(key) for key in config.env_vars or ())
+        )
+
+    async def workspace_volume_exists(self, session_id: str) -> bool:
+        """Return True if the session already has a persisted workspace volume."""
+        try:
+            await modal.Volume.from_name(self.workspace_volume_name(session_id)).hydrate.aio()
+            return True
+        except modal.exception.NotFoundError:
+            return False
+
+    async def image_id(self, image_type: str) -> str:
+        """Return the object ID of the image new sandboxes of image_type boot from.
+
+        Pool entries spawned from any other image predate a deploy and are
+        discarded rather than claimed. The first call per container resolves
+        the image against Modal's build cache; later calls reuse the handle.
+        """
+        image = self._get_image(image_type)
+        if not image.is_hydrated:
+            await image.build.aio(self.app)
+        return image.object_id
+
+    async def pooled_secret(self) -> modal.Secret:
+        """Create the session-less secret shared by a batch of pooled sandboxes.
+
+        Hydrated up front so concurrent spawns reuse one ephemeral secret
+        instead of each registering its own.
+        """
+        secrets_dict = {
+            "VALET_WARM_POOL": "1",
             "OPENCODE_SERVER_PASSWORD": get_secret("OPENCODE_SERVER_PASSWORD"),
-        })
+        }
+        secret = modal.Secret.from_dict({k: v for k, v in secrets_dict.items() if v})
+        await secret.hydrate.aio()
+        return secret
+
+    async def spawn_pooled(self, image_type: str, secret: modal.Secret) -> PooledSandbox:
+        """Spawn a session-less sandbox for the warm pool.
+
+        The sandbox boots its session-agnostic services and then waits in
+        start.sh for a session env file (see claim_pooled). Its workspace
+        volume gets a pool-scoped name and is renamed on claim. Returns once
+        those services accept connections; a sandbox that fails to come up
+        is discarded and RuntimeError is raised. `secret` comes from
+        pooled_secret().
+
+        Lifetime and idle timeout are fixed at creation, so they match a
+        default session's: a shorter pool idle timeout would also apply to
+        the session that claims the sandbox.
+        """
+        volume_name = self.pool_volume_name()
+        image = self._get_image(image_type)
+
+        try:
+            sandbox = await self._create(
+                "/bin/bash", "/start.sh",
+                app=self.app,
+                image=image,
+                cpu=SANDBOX_DEFAULT_CPU_CORES,
+                memory=SANDBOX_DEFAULT_MEMORY_MIB,
+                encrypted_ports=[OPENCODE_PORT, GATEWAY_PORT],
+                timeout=MAX_TIMEOUT_SECONDS,
+                idle_timeout=DEFAULT_IDLE_TIMEOUT_SECONDS + MODAL_IDLE_TIMEOUT_BUFFER_SECONDS,
+                secrets=[secret],
+                volumes={
+                    "/workspace": modal.Volume.from_name(volume_name, create_if_missing=True),
+                    WHISPER_MODELS_MOUNT: self._whisper_volume,
+                    BROWSER_PROFILE_SEED_MOUNT: self._browser_profile_seed,
+                },
+            )
+        except Exception:
+            # Sandbox.create may already have created the volume, and no pool
+            # entry tracks it yet; delete it here rather than leak it.
+            try:
+                await self._delete_pool_volume(volume_name)
+            except Exception as exc:
+                logger.warning("pool: failed to delete volume %s: %s", volume_name, exc)
+            raise
+        pooled = PooledSandbox(sandbox_id=sandbox.object_id, volume_name=volume_name, image_id=image.object_id)
+        try:
+            await self._wait_ready(sandbox, SANDBOX_POOL_READY_PORTS)
+        except Exception:
+            await self.discard_pooled(pooled)
+            raise
+        return pooled
+
+    async def claim_pooled(self, pooled: PooledSandbox, config: SandboxConfig) -> SandboxResult:
+        """Assign a pooled sandbox to a session.
+
+        Renames the pool workspace volume to the session's volume name and
+        hands the session secrets to start.sh via an env file.
+        Raises SandboxAlreadyFinishedError if the pooled sandbox has exited.
+        """
+        sandbox = await modal.Sandbox.from_id.aio(pooled.sandbox_id)
+        if await sandbox.poll.aio() is not None:
+            raise SandboxAlreadyFinishedError(pooled.sandbox_id)
+
+        # The volume rename and tunnel lookup are independent RPCs; overlap them.
+        # The env file goes last since it releases start.sh into the session.
+        _, tunnels = await asyncio.gather(
+            modal.Volume.rename.aio(pooled.volume_name, self.workspace_volume_name(config.session_id)),
+            sandbox.tunnels.aio(),
+        )
+        await self._write_session_env(sandbox, self._build_secrets(config))
 
-        secrets_dict = {k: v for k, v in secrets_dict.items() if v}
+        return SandboxResult(
+            sandbox_id=sandbox.object_id,
+            tunnel_urls=self._parse_tunnels(tunnels),
+        )
+
+    async def discard_pooled(self, pooled: PooledSandbox) -> None:
+        """Terminate a pooled sandbox and delete its pool volume. Best-effort.
+
+        Waits for the sandbox to actually exit before returning, so the
+        volume is unmounted before deletion and a refill that follows does
+        not briefly run above the pool size.
+        """
+        try:
+            sandbox = await modal.Sandbox.from_id.aio(pooled.sandbox_id)
+            await sandbox.terminate.aio()
+            await sandbox.wait.aio(raise_on_termination=False)
+        except modal.exception.NotFoundError:
+            pass
+        await self._delete_pool_volume(pooled.volume_name)
 
-        sandbox = await modal.Sandbox.create.aio(
+    @staticmethod
+    async def _delete_pool_volume(volume_name: str) -> None:
+        """Delete a pool workspace volume if it exists."""
+        try:
+            await modal.Volume.delete.aio(volume_name)
+        except modal.exception.NotFoundError:
+            pass
+
+    async def is_pooled_alive(self, pooled: PooledSandbox) -> bool:
+        """Return True if a pooled sandbox is still running."""
+        try:
+            sandbox = await modal.Sandbox.from_id.aio(pooled.sandbox_id)
+        except modal.exception.NotFoundError:
+            return False
+        return await sandbox.poll.aio() is None
+
+    @staticmethod
+    async def _wait_ready(sandbox: modal.Sandbox, ports: tuple[int, ...]) -> None:
+        """Wait until all ports accept connections, using one exec for every port."""
+        process = await sandbox.exec.aio(
+            "/usr/local/bin/wait-ready.sh", *map(str, ports),
+            timeout=SANDBOX_POOL_READY_TIMEOUT_SECONDS,
+        )
+        exit_code = await process.wait.aio()
+        if exit_code != 0:
+            raise RuntimeError(f"Sandbox {sandbox.object_id} not ready on ports {ports} (exit {exit_code})")
+
+    @staticmethod
+    async def _write_session_env(sandbox: modal.Sandbox, env: dict[str, str]) -> None:
+        """Atomically write session env vars where a pooled start.sh waits for them.
+
+        Values are shell-quoted; names are written as-is, so they must be
+        shell identifiers (is_poolable enforces this for env_vars).
+        """
+        payload = "".join(f"export {k}={shlex.quote(v)}\n" for k, v in env.items())
+        tmp_path = f"{SANDBOX_SESSION_ENV_PATH}.tmp"
+        process = await sandbox.exec.aio(
+            "/bin/bash", "-c",
+            f"umask 077 && mkdir -p {os.path.dirname(SANDBOX_SESSION_ENV_PATH)} "
+            f"&& cat > {tmp_path} && mv {tmp_path} {SANDBOX_SESSION_ENV_PATH}",
+        )
+        process.stdin.write(payload)
+        process.stdin.write_eof()
+        await process.stdin.drain.aio()
+        exit_code = await process.wait.aio()
+        if exit_code != 0:
+            raise RuntimeError(f"Failed to write session env to sandbox {sandbox.object_id} (exit {exit_code})")
+
+    # ─── Helpers ─────────────────────────────────────────────────────────
+
+    def _record_status(self, sandbox_id: str, status: str) -> None:
+        """Cache a looked-up sandbox status; see get_sandbox_status."""
+        if len(self._status_cache) >= SANDBOX_STATUS_CACHE_MAX_ENTRIES:
+            self._status_cache.clear()
+        ttl = math.inf if status == "terminated" else SANDBOX_STATUS_CACHE_TTL_SECONDS
+        self._status_cache[sandbox_id] = (status, time.monotonic() + ttl)
+
+    async def _spawn(self, image: modal.Image, config: SandboxConfig) -> SandboxResult:
+        """Start a session sandbox from image and return its tunnel URLs."""
+        sandbox = await self._create(
             "/bin/bash", "/start.sh",
             app=self.app,
             image=image,
@@ -225,35 +553,274 @@ class SandboxManager:
             encrypted_ports=[OPENCODE_PORT, GATEWAY_PORT],
             timeout=MAX_TIMEOUT_SECONDS,
             idle_timeout=config.idle_timeout_seconds + MODAL_IDLE_TIMEOUT_BUFFER_SECONDS,
-            secrets=[modal.Secret.from_dict(secrets_dict)],
+            secrets=[modal.Secret.from_dict(self._build_secrets(config))],
             volumes={
                 "/workspace": modal.Volume.from_name(
                     self.workspace_volume_name(config.session_id),
                     create_if_missing=True,
                 ),
-                WHISPER_MODELS_MOUNT: modal.Volume.from_name(WHISPER_MODELS_VOLUME),
+                WHISPER_MODELS_MOUNT: self._whisper_volume,
+                BROWSER_PROFILE_SEED_MOUNT: self._browser_profile_seed,
             },
         )
 
         tunnels = await sandbox.tunnels.aio()
 
+        return SandboxResult(
+            sandbox_id=sandbox.object_id,
+            tunnel_urls=self._parse_tunnels(tunnels),
+        )
+
+    async def _create(self, *args, **kwargs) -> modal.Sandbox:
+        """modal.Sandbox.create, paced by the creation rate limiter.
+
+        Each attempt is bounded by SANDBOX_CREATE_TIMEOUT_SECONDS. Only rate
+        limiting is retried, with exponential backoff, up to
+        SANDBOX_CREATE_ATTEMPTS; any failure surfaces as SandboxCreationError.
+        """
+        last_exc: Exception | None = None
+        for attempt in range(SANDBOX_CREATE_ATTEMPTS):
+            await self._create_limiter.acquire()
+            try:
+                return await asyncio.wait_for(
+                    modal.Sandbox.create.aio(*args, **kwargs),
+                    timeout=SANDBOX_CREATE_TIMEOUT_SECONDS,
+                )
+            except TimeoutError as exc:
+                # Not retried: the timed-out create may still succeed on
+                # Modal's side, and a second one would run alongside it.
+                raise SandboxCreationError(
+                    f"Sandbox creation timed out after {SANDBOX_CREATE_TIMEOUT_SECONDS}s"
+                ) from exc
+            except Exception as exc:
+                if not _is_rate_limit_error(exc):
+                    raise SandboxCreationError(f"Sandbox creation failed: {exc}") from exc
+                logger.warning("create: rate limited (attempt %d): %s", attempt + 1, exc)
+                last_exc = exc
+                if attempt + 1 < SANDBOX_CREATE_ATTEMPTS:
+                    await asyncio.sleep(SANDBOX_CREATE_BACKOFF_SECONDS * 2**attempt)
+        raise SandboxCreationError(
+            f"Sandbox creation failed after {SANDBOX_CREATE_ATTEMPTS} attempts: {last_exc!r}"
+        ) from last_exc
+
+    @staticmethod
+    def _build_secrets(config: SandboxConfig) -> dict[str, str]:
+        """Build the sandbox env for a session."""
+        # Start with caller-provided env vars (LLM keys, repo config, etc.)
+        secrets_dict: dict[str, str] = dict(config.env_vars) if config.env_vars else {}
+
+        # Core secrets are set last so env_vars cannot override them
+        secrets_dict.update({
+            "DO_WS_URL": config.do_ws_url,
+            "RUNNER_TOKEN": config.runner_token,
+            "SESSION_ID": config.session_id,
+            "JWT_SECRET": config.jwt_secret,
+            "OPENCODE_SERVER_PASSWORD": get_secret("OPENCODE_SERVER_PASSWORD"),
+        })
+
+        # Strip empty values so Modal doesn't set blank env vars
+        return {k: v for k, v in secrets_dict.items() if v}
+
+    @staticmethod
+    def _parse_tunnels(tunnels: dict) -> dict[str, str]:
+        """Map Modal tunnels to the service URLs exposed to the client."""
         tunnel_urls: dict[str, str] = {}
         if OPENCODE_PORT in tunnels:
             tunnel_urls["opencode"] = tunnels[OPENCODE_PORT].url
         if GATEWAY_PORT in tunnels:
             gateway_url = tunnels[GATEWAY_PORT].url
             tunnel_urls["gateway"] = gateway_url
-            tunnel_urls["vscode"] = f"{gateway_url}/vscode"
-            tunnel_urls["vnc"] = f"{gateway_url}/vnc"
-            tunnel_urls["ttyd"] = f"{gateway_url}/ttyd"
-
-        return SandboxResult(
-            sandbox_id=sandbox.object_id,
-            tunnel_urls=tunnel_urls,
-        )
+            for key, suffix in _GATEWAY_SUFFIXES:
+                tunnel_urls[key] = gateway_url + suffix
+        return tunnel_urls
 
     def _get_image(self, image_type: str) -> modal.Image:
         """Get the appropriate image for the workspace type."""
         # Phase 1: always use base image
         # Future: repo-specific images
-        return get_base_image()
+        return self._base_image
+
+
+def _is_rate_limit_error(exc: Exception) -> bool:
+    """Return True if exc is Modal rejecting a create for exceeding its rate limit."""
+    if _RateLimitError is not None and isinstance(exc, _RateLimitError):
+        return True
+    return "rate limit exceeded" in str(exc).lower()
+
+
+class WarmPool:
+    """Warm pool of pre-spawned sandboxes, keyed by image type.
+
+    Pool entries live in a modal.Queue (one partition per image type) rather
+    than an in-process asyncio.Queue: every web endpoint runs in its own
+    container, so only a Modal-side queue lets them and the scheduled refill
+    share one pool.
+    """
+
+    def __init__(
+        self,
+        sandbox_manager: SandboxManager,
+        min_size: int = SANDBOX_POOL_SIZE,
+        max_size: int = SANDBOX_POOL_MAX_SIZE,
+    ) -> None:
+        self.sandbox_manager = sandbox_manager
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.queue = modal.Queue.from_name(SANDBOX_POOL_QUEUE, create_if_missing=True)
+        # Refill runs in a fresh container each tick, so demand state lives
+        # Modal-side: every poolable request puts a marker in the demand queue
+        # (one partition per image type), and the rate estimate is kept in a
+        # modal.Dict: image_type -> {"rate", "at"}.
+        self.demand = modal.Queue.from_name(SANDBOX_POOL_DEMAND_QUEUE, create_if_missing=True)
+        self.stats = modal.Dict.from_name(SANDBOX_POOL_STATS, create_if_missing=True)
+        # Strong references to in-flight background discards (see acquire).
+        self._discards: set[asyncio.Task] = set()
+
+    async def acquire(self, config: SandboxConfig) -> SandboxResult | None:
+        """Claim a warm sandbox for a session. Returns None on a pool miss."""
+        if self.max_size <= 0 or not self.sandbox_manager.is_poolable(config):
+            return None
+        # The pool is an optimisation: if Modal cannot answer the lookups
+        # below, the session takes the cold path instead of failing.
+        # Pooled sandboxes come with a fresh workspace volume; sessions that
+        # already have one must mount it, so they take the cold path.
+        try:
+            if await self.sandbox_manager.workspace_volume_exists(config.session_id):
+                return None
+            image_id = await self.sandbox_manager.image_id(config.image_type)
+        except Exception as exc:
+            logger.warning("pool: lookup for session %s failed: %s", config.session_id, exc)
+            return None
+        await self.record_demand(config.image_type)
+
+        while True:
+            try:
+                entry = await self.queue.get.aio(block=False, partition=config.image_type)
+            except Exception as exc:
+                logger.warning("pool: failed to take a %s sandbox from the queue: %s", config.image_type, exc)
+                return None
+            if entry is None:
+                return None
+            pooled = PooledSandbox(**entry)
+            if pooled.image_id != image_id:
+                # Spawned before the current deploy. Discard it off the
+                # request path and try the next entry.
+                self._discard_in_background(pooled)
+                continue
+            try:
+                return await self.sandbox_manager.claim_pooled(pooled, config)
+            except SandboxAlreadyFinishedError:
+                await self.sandbox_manager.discard_pooled(pooled)
+            except Exception as exc:
+                logger.warning("pool: failed to claim sandbox %s: %s", pooled.sandbox_id, exc)
+                await self.sandbox_manager.discard_pooled(pooled)
+                return None
+
+    def _discard_in_background(self, pooled: PooledSandbox) -> None:
+        """Discard a pool entry without making the caller wait for it to exit."""
+        task = asyncio.create_task(self.sandbox_manager.discard_pooled(pooled))
+        self._discards.add(task)
+        task.add_done_callback(self._discard_done)
+
+    def _discard_done(self, task: asyncio.Task) -> None:
+        self._discards.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("pool: background discard failed: %s", task.exception())
+
+    async def record_demand(self, image_type: str) -> None:
+        """Count a request the pool could serve, whether it hits or misses."""
+        if self.max_size <= self.min_size:
+            return
+        try:
+            await self.demand.put.aio(time.time(), block=False, partition=image_type)
+        except Exception as exc:
+            logger.warning("pool: failed to record %s demand: %s", image_type, exc)
+
+    @staticmethod
+    def split_surplus(pooled: list[PooledSandbox], target: int) -> tuple[list[PooledSandbox], list[PooledSandbox]]:
+        """Split queue-ordered entries into (oldest surplus beyond target, kept)."""
+        excess = max(len(pooled) - target, 0)
+        return pooled[:excess], pooled[excess:]
+
+    async def shrink(self, pooled: list[PooledSandbox]) -> None:
+        """Discard pool entries, waiting until each sandbox has exited.
+
+        Called before spawning replacements, so spawns cannot take the pool
+        above target while discarded sandboxes are still shutting down.
+        """
+        await asyncio.gather(*(self.sandbox_manager.discard_pooled(p) for p in pooled))
+
+    async def refill(self) -> None:
+        """Bring each pooled image type to its target number of live entries.
+
+        Live entries go back on the queue right after the liveness check, and
+        each new sandbox is enqueued as soon as it is ready, so claims keep
+        hitting while the refill runs and a failed refill strands nothing.
+        Entries spawned from an older image are dropped, so a deploy replaces
+        the pool on the next refill. Dead, stale and surplus entries are fully
+        terminated before replacements are spawned.
+        """
+        for image_type in SANDBOX_POOL_IMAGE_TYPES:
+            image_id = await self.sandbox_manager.image_id(image_type)
+            target = await self.target_size(image_type)
+            size = await self.queue.len.aio(partition=image_type)
+            entries = await self.queue.get_many.aio(size, block=False, partition=image_type) if size else []
+            pooled = [PooledSandbox(**entry) for entry in entries]
+            stale = [p for p in pooled if p.image_id != image_id]
+            current = [p for p in pooled if p.image_id == image_id]
+
+            alive = await asyncio.gather(*(self.sandbox_manager.is_pooled_alive(p) for p in current))
+            live = [p for p, ok in zip(current, alive) if ok]
+            dead = [p for p, ok in zip(current, alive) if not ok]
+            surplus, live = self.split_surplus(live, target)
+            if live:
+                await self.queue.put_many.aio([asdict(p) for p in live], partition=image_type)
+            await self.shrink(stale + dead + surplus)
+
+            # Spawn in batches with a pause between them so a large refill
+            # does not burst past Modal's sandbox creation rate limit.
+            missing = target - len(live)
+            while missing > 0:
+                batch = min(missing, SANDBOX_POOL_BATCH_SIZE)
+                secret = await self.sandbox_manager.pooled_secret()
+                spawned = await asyncio.gather(
+                    *(self._spawn_and_enqueue(image_type, secret) for _ in range(batch)),
+                    return_exceptions=True,
+                )
+                for result in spawned:
+                    if isinstance(result, Exception):
+                        logger.warning("pool: failed to spawn %s sandbox: %s", image_type, result)
+                missing -= batch
+                if missing > 0:
+                    await asyncio.sleep(SANDBOX_POOL_BATCH_DELAY_SECONDS)
+
+    async def _spawn_and_enqueue(self, image_type: str, secret: modal.Secret) -> None:
+        """Spawn one pooled sandbox and put it on the queue once it is ready."""
+        pooled = await self.sandbox_manager.spawn_pooled(image_type, secret)
+        try:
+            await self.queue.put.aio(asdict(pooled), partition=image_type)
+        except Exception:
+            await self.sandbox_manager.discard_pooled(pooled)
+            raise
+
+    async def target_size(self, image_type: str) -> int:
+        """Return the target pool size for an image type.
+
+        Drains the demand recorded since the previous refill into the request
+        rate estimate. Misses count as much as claims, so an empty pool still
+        grows once requests arrive. The target covers the estimated requests
+        while a claimed sandbox is being replaced: one refill interval plus
+        spawn latency.
+        """
+        if self.max_size <= self.min_size:
+            return self.min_size
+        pending = await self.demand.len.aio(partition=image_type)
+        drained = await self.demand.get_many.aio(pending, block=False, partition=image_type) if pending else []
+        now = time.time()
+        stats = await self.stats.get.aio(image_type)
+        estimator = RateEstimator(alpha=SANDBOX_POOL_RATE_EWMA_ALPHA, rate=stats["rate"] if stats else 0.0)
+        if stats is not None:
+            estimator.update(len(drained), now - stats["at"])
+        await self.stats.put.aio(image_type, {"rate": estimator.rate, "at": now})
+        horizon = SANDBOX_POOL_REFILL_INTERVAL_SECONDS + SANDBOX_POOL_SPAWN_LATENCY_SECONDS
+        return min(max(round(estimator.rate * horizon), self.min_size), self.max_size)
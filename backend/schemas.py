@@ -0,0 +1,84 @@
+"""Request and response bodies for the Modal web endpoints."""
+
+from __future__ import annotations
+
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+
+from session import CreateSessionRequest
+
+
+class _Body(BaseModel):
+    """Base for endpoint bodies: camelCase on the wire, unknown keys ignored.
+
+    Endpoints declare response models as their return type so FastAPI
+    serializes responses straight to JSON bytes in pydantic-core.
+    """
+
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True,
+        extra="ignore",
+        frozen=True,
+    )
+
+
+class CreateSessionBody(_Body):
+    session_id: str
+    user_id: str
+    workspace: str
+    image_type: str = "base"
+    do_ws_url: str
+    runner_token: str
+    jwt_secret: str
+    idle_timeout_seconds: int = 900
+    sandbox_cpu_cores: float | None = None
+    sandbox_memory_mib: int | None = None
+    env_vars: dict[str, str | None] | None = None
+    persona_files: list[dict] | None = None
+
+    def to_request(self) -> CreateSessionRequest:
+        return CreateSessionRequest(
+            session_id=self.session_id,
+            user_id=self.user_id,
+            workspace=self.workspace,
+            image_type=self.image_type,
+            do_ws_url=self.do_ws_url,
+            runner_token=self.runner_token,
+            jwt_secret=self.jwt_secret,
+            idle_timeout_seconds=self.idle_timeout_seconds,
+            cpu_cores=self.sandbox_cpu_cores,
+            memory_mib=self.sandbox_memory_mib,
+            env_vars=self.env_vars,
+            persona_files=self.persona_files,
+        )
+
+
+class RestoreSessionBody(CreateSessionBody):
+    snapshot_image_id: str
+
+
+class SandboxBody(_Body):
+    sandbox_id: str
+
+
+class WorkspaceBody(_Body):
+    session_id: str
+
+
+class SessionResponse(_Body):
+    sandbox_id: str
+    tunnel_urls: dict[str, str]
+
+
+class SuccessResponse(_Body):
+    success: bool = True
+
+
+class HibernateResponse(_Body):
+    snapshot_image_id: str
+
+
+class DeleteWorkspaceResponse(_Body):
+    success: bool = True
+    deleted: bool
@@ -2,14 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 
 import modal
 
+from config import MAX_CONCURRENT_CREATES
 from sandboxes import SandboxConfig, SandboxManager, SandboxResult
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CreateSessionRequest:
     session_id: str
     user_id: str
@@ -25,7 +27,7 @@ class CreateSessionRequest:
     persona_files: list[dict] | None = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CreateSessionResponse:
     sandbox_id: str
     tunnel_urls: dict[str, str]
@@ -36,6 +38,9 @@ class SessionManager:
 
     def __init__(self, app: modal.App) -> None:
         self.sandbox_manager = SandboxManager(app)
+        # Caps in-flight creates/restores in this container; excess requests
+        # wait here instead of piling onto Modal's creation rate limit.
+        self._create_sem = asyncio.Semaphore(MAX_CONCURRENT_CREATES)
 
     async def create(self, req: CreateSessionRequest) -> CreateSessionResponse:
         """Create a new session by spawning a sandbox."""
@@ -54,7 +59,8 @@ class SessionManager:
             persona_files=req.persona_files,
         )
 
-        result: SandboxResult = await self.sandbox_manager.create_sandbox(config)
+        async with self._create_sem:
+            result: SandboxResult = await self.sandbox_manager.create_sandbox(config)
 
         return CreateSessionResponse(
             sandbox_id=result.sandbox_id,
@@ -93,7 +99,8 @@ class SessionManager:
             persona_files=req.persona_files,
         )
 
-        result: SandboxResult = await self.sandbox_manager.restore_sandbox(config, snapshot_image_id)
+        async with self._create_sem:
+            result: SandboxResult = await self.sandbox_manager.restore_sandbox(config, snapshot_image_id)
 
         return CreateSessionResponse(
             sandbox_id=result.sandbox_id,
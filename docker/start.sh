@@ -35,6 +35,18 @@ x11vnc -display :99 -forever -shared -rfbport 5900 -nopw -quiet &
 websockify --web /usr/share/novnc ${VNC_PORT} localhost:5900 &
 echo "[start.sh] VNC accessible on port ${VNC_PORT}"
 
+# ─── Browser Profile ───────────────────────────────────────────────────
+# Copy the pre-initialized Chromium profile (seeded by the backend's
+# setup_browser_profile) so agent-browser's first launch skips profile setup.
+# Only an empty profile is seeded; a restored snapshot keeps its own.
+BROWSER_PROFILE_SEED=/seed/chromium-profile
+AGENT_BROWSER_PROFILE="${AGENT_BROWSER_PROFILE:-/root/.agent-browser-profile}"
+if [ -n "$(ls -A "${BROWSER_PROFILE_SEED}" 2>/dev/null)" ] && [ -z "$(ls -A "${AGENT_BROWSER_PROFILE}" 2>/dev/null)" ]; then
+  mkdir -p "${AGENT_BROWSER_PROFILE}"
+  cp -a "${BROWSER_PROFILE_SEED}/." "${AGENT_BROWSER_PROFILE}/"
+  echo "[start.sh] Seeded browser profile at ${AGENT_BROWSER_PROFILE}"
+fi
+
 # ─── Git Configuration ─────────────────────────────────────────────────
 # Git credentials and repo cloning are handled by the Runner process.
 # start.sh only sets up the global gitignore.
@@ -53,6 +65,25 @@ WORK_DIR=/workspace
 mkdir -p "${WORK_DIR}/.opencode/state"
 export OPENCODE_DB="${WORK_DIR}/.opencode/state/opencode.db"
 
+# ─── Session Assignment (warm pool) ───────────────────────────────────
+# Warm-pool sandboxes boot the session-agnostic stack above without a
+# session, then wait here until the backend claims them and writes the
+# session env file. Everything below needs the session env (secrets,
+# repo config), so it starts only after assignment.
+if [ -n "${VALET_WARM_POOL:-}" ]; then
+  SESSION_ENV_FILE=/run/valet/session.env
+  echo "[start.sh] Warm pool sandbox — waiting for session assignment"
+  while [ ! -f "${SESSION_ENV_FILE}" ]; do
+    sleep 0.2
+  done
+  set -a
+  . "${SESSION_ENV_FILE}"
+  set +a
+  rm -f "${SESSION_ENV_FILE}"
+  unset VALET_WARM_POOL
+  echo "[start.sh] Assigned session: ${SESSION_ID}"
+fi
+
 # Write minimal repo context so services starting before the Runner clones
 # have some awareness of the target repo.
 if [ -n "${REPO_URL:-}" ]; then
@@ -0,0 +1,11 @@
+#!/bin/bash
+# Block until every TCP port given as an argument accepts connections on
+# localhost. Lets the backend wait for several services with a single exec.
+#
+# Usage: wait-ready.sh PORT [PORT...]
+
+for port in "$@"; do
+  until (exec 3<>"/dev/tcp/127.0.0.1/${port}") 2>/dev/null; do
+    sleep 0.1
+  done
+done